@@ -53,6 +53,19 @@ CREATE_INDEXES = [
     "CREATE INDEX IF NOT EXISTS idx_delivery_logs_patient ON delivery_logs(patient_id);",
     "CREATE INDEX IF NOT EXISTS idx_delivery_logs_drug ON delivery_logs(drug_id);",
     "CREATE INDEX IF NOT EXISTS idx_delivery_logs_date ON delivery_logs(delivery_date);",
+    # Per-patient history, newest first, without a separate sort pass. The
+    # trailing id DESC matches fetch_delivery_history's tie-break so the scan
+    # needs no sort at all.
+    "CREATE INDEX IF NOT EXISTS idx_delivery_patient_date ON delivery_logs(patient_id, delivery_date DESC, id DESC);",
+    # Composite index matching the stats filters (status='...' AND
+    # delivery_date cmp ?) so each counter is an index range scan.
+    "CREATE INDEX IF NOT EXISTS idx_delivery_status_date ON delivery_logs(status, delivery_date);",
+    # Per-drug listings of transactions/batches/removals, newest first.
+    "CREATE INDEX IF NOT EXISTS idx_inv_tx_drug_time ON inventory_transactions(drug_id, created_at DESC);",
+    # (drug_id, id DESC) matches the ORDER BY id DESC the list methods use and
+    # the definition the Flask app's schema installs under the same names.
+    "CREATE INDEX IF NOT EXISTS idx_batches_drug ON drug_batches(drug_id, id DESC);",
+    "CREATE INDEX IF NOT EXISTS idx_removals_drug ON drug_removals(drug_id, id DESC);",
 ]
 
 # Additional inventory / batch related tables (added later in project lifecycle)
@@ -105,12 +118,45 @@ def get_connection(db_path: Optional[str] = None) -> Connection:
     - Sets row factory to sqlite3.Row for dict-like access
     """
     path = db_path or DEFAULT_DB_PATH
-    conn = sqlite3.connect(path)
+    # Larger statement cache (default 100) so every hot endpoint's prepared
+    # statement stays resident and re-execution skips SQL re-preparation;
+    # 512 leaves headroom for the dynamic UPDATE variants api.py generates.
+    conn = sqlite3.connect(path, cached_statements=512)
     conn.row_factory = sqlite3.Row
 
     # Enforce foreign key constraints
     conn.execute("PRAGMA foreign_keys = ON;")
 
+    # WAL lets readers proceed while a write is in flight, and NORMAL sync is
+    # safe under WAL while skipping an fsync per commit. Temp tables and a
+    # 64MB page cache stay in memory. Guarded because journal_mode cannot be
+    # switched on read-only media.
+    try:
+        conn.execute("PRAGMA journal_mode = WAL;")
+    except sqlite3.OperationalError as e:  # pragma: no cover - defensive
+        print("[DB][Warn] Could not enable WAL:", e)
+    conn.execute("PRAGMA synchronous = NORMAL;")
+    conn.execute("PRAGMA temp_store = MEMORY;")
+    conn.execute("PRAGMA cache_size = -64000;")
+    # Memory-map the database file (up to 256MB) so reads bypass the page
+    # cache copy, and wait out short write locks instead of failing fast.
+    conn.execute("PRAGMA mmap_size = 268435456;")
+    conn.execute("PRAGMA busy_timeout = 5000;")
+
+    return conn
+
+
+def get_ro_connection(db_path: Optional[str] = None) -> Connection:
+    """Open a read-only connection to the database via a mode=ro URI.
+
+    Read-only handles cannot write (enforced by SQLite itself) and, under
+    WAL, read concurrently with the single read-write connection. Rows come
+    back as plain tuples — callers on the read path shape their own dicts.
+    """
+    path = db_path or DEFAULT_DB_PATH
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, cached_statements=512)
+    conn.execute("PRAGMA mmap_size = 268435456;")
+    conn.execute("PRAGMA busy_timeout = 5000;")
     return conn
 
 
@@ -146,4 +192,7 @@ def init_db(conn: Connection) -> None:
                 print("[DB] Added drugs.reorder_level column")
             except Exception as e:  # pragma: no cover
                 print("[DB][Warn] Could not add reorder_level column:", e)
+
+        # Refresh planner statistics so the new composite indexes get picked.
+        conn.execute("ANALYZE;")
     print("[DB] Schema ready ✔")
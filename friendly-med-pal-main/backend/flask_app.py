@@ -1,26 +1,92 @@
+import functools
+import os
+import queue
+import re
 import sqlite3
+import time
+from contextlib import contextmanager
 from pathlib import Path
 from datetime import datetime, date, timezone
+import msgspec
+import orjson
 from flask import Flask, request, jsonify, send_from_directory
+from flask_compress import Compress
 from flask_cors import CORS
+from whitenoise import WhiteNoise
 
 DB_PATH = Path(__file__).resolve().parent / 'drug_delivery.db'
 
 APP_ROOT = Path(__file__).resolve().parent.parent
 INDEX_HTML_NAME = 'index.html'
 app = Flask(__name__, static_folder=str(APP_ROOT), static_url_path='')
+# Static assets go through WhiteNoise's WSGI layer (scanned once at startup,
+# served with sendfile-friendly streams and cache headers) so Flask's routing
+# and Werkzeug pipeline only run for /api/* and the SPA root.
+app.wsgi_app = WhiteNoise(app.wsgi_app, root=str(APP_ROOT), prefix='', autorefresh=False, max_age=3600)
 CORS(app)
-
-ALLOWED_STATUSES = {"pending","delivered","missed","cancelled"}
+# The row-list endpoints return highly repetitive JSON (same keys per row);
+# compressing bodies over 1KB cuts egress several-fold for one cheap pass
+# over bytes orjson already produced.
+app.config['COMPRESS_MIMETYPES'] = ['application/json']
+app.config['COMPRESS_LEVEL'] = 4
+app.config['COMPRESS_MIN_SIZE'] = 1024
+Compress(app)
+
+ALLOWED_STATUSES = frozenset({"pending","delivered","missed","cancelled"})
+# Cheap shape check up front so bad input returns 400 without paying for a
+# date.fromisoformat exception on the error path.
+_DATE_RE = re.compile(r'^\d{4}-\d{2}-\d{2}$').match
+
+# ai_rewrite transforms, compiled once: one regex scan replaces the chained
+# str.replace passes, and one split handles both newlines and sentence ends.
+_SENT_SPLIT = re.compile(r'[.\n]+')
+_CMAP = {"can't": 'cannot', "won't": 'will not', "I'm": 'I am'}
+_CONTRACTIONS = re.compile(r"\b(can't|won't|I'm)\b")
+_STOCK_KEYWORDS = ('stockout', 'low stock', 'low-stock', 'reorder', 'stock risk', 'risk of stockout')
+# Constant ai_chat reply fragments, built once instead of per request.
+_NO_QUESTION = 'No direct question detected; providing status summary.'
+_ENABLE_CTX = 'Enable Context to retrieve the live low stock list.'
+_TIP = '(Tip: enable Context checkbox to include live inventory risk data.)'
+_FRIENDLY = 'Let me know if you want deeper analysis or projections – happy to help! 😊'
+_ANALYST = 'Data source: live inventory snapshot at query time.'
 
 # --- DB helpers -------------------------------------------------------------
 
 def get_conn():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
+    # No Row factory: rows stay plain C-level tuples; row_list maps column
+    # names from cursor.description once per query instead of per row.
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False, cached_statements=256)
     conn.execute('PRAGMA foreign_keys=ON;')
+    conn.execute('PRAGMA synchronous=NORMAL;')
+    conn.execute('PRAGMA temp_store=MEMORY;')
+    conn.execute('PRAGMA cache_size=-65536;')
+    conn.execute('PRAGMA mmap_size=268435456;')
+    # Wait out short write locks instead of surfacing SQLITE_BUSY to callers.
+    conn.execute('PRAGMA busy_timeout=5000;')
     return conn
 
+# Long-lived connection pool: connecting per request paid sqlite3.connect
+# setup plus PRAGMA parsing every time and threw away the page and statement
+# caches. Connections are created lazily up to _POOL_SIZE and returned to the
+# pool (not closed) after each request; LIFO keeps the hottest one busiest.
+_POOL_SIZE = 8  # >= gunicorn --threads so every worker thread gets a connection
+_POOL: queue.LifoQueue = queue.LifoQueue(maxsize=_POOL_SIZE)
+
+
+@contextmanager
+def conn_ctx():
+    try:
+        conn = _POOL.get_nowait()
+    except queue.Empty:
+        conn = get_conn()
+    try:
+        yield conn
+    finally:
+        try:
+            _POOL.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
 SCHEMA_CREATED = False
 
 def init_db():
@@ -28,210 +94,408 @@ def init_db():
     if SCHEMA_CREATED:
         return
     conn = get_conn()
-    with conn:
-        conn.execute("""CREATE TABLE IF NOT EXISTS patients(id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, age INTEGER, contact TEXT)""")
-        conn.execute("""CREATE TABLE IF NOT EXISTS drugs(id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, dosage TEXT NOT NULL, frequency TEXT NOT NULL, stock INTEGER NOT NULL DEFAULT 0, reorder_level INTEGER NOT NULL DEFAULT 0)""")
-        conn.execute("""CREATE TABLE IF NOT EXISTS delivery_logs(id INTEGER PRIMARY KEY AUTOINCREMENT, patient_id INTEGER NOT NULL, drug_id INTEGER NOT NULL, delivery_date TEXT NOT NULL, status TEXT NOT NULL CHECK(status IN ('pending','delivered','missed','cancelled')), FOREIGN KEY(patient_id) REFERENCES patients(id) ON DELETE CASCADE, FOREIGN KEY(drug_id) REFERENCES drugs(id) ON DELETE CASCADE)""")
-        # inventory tables
-        conn.execute("""CREATE TABLE IF NOT EXISTS inventory_transactions(id INTEGER PRIMARY KEY AUTOINCREMENT, drug_id INTEGER NOT NULL, delta INTEGER NOT NULL, reason TEXT, created_at TEXT NOT NULL DEFAULT (datetime('now')), FOREIGN KEY(drug_id) REFERENCES drugs(id) ON DELETE CASCADE)""")
-        conn.execute("""CREATE TABLE IF NOT EXISTS drug_batches(id INTEGER PRIMARY KEY AUTOINCREMENT, drug_id INTEGER NOT NULL, batch_no TEXT, isbn TEXT, producer TEXT, transporter TEXT, mfg_date TEXT, exp_date TEXT, quantity INTEGER NOT NULL CHECK(quantity>0), notes TEXT, created_at TEXT NOT NULL DEFAULT (datetime('now')), FOREIGN KEY(drug_id) REFERENCES drugs(id) ON DELETE CASCADE)""")
-        conn.execute("""CREATE TABLE IF NOT EXISTS drug_removals(id INTEGER PRIMARY KEY AUTOINCREMENT, drug_id INTEGER NOT NULL, batch_no TEXT, reason TEXT NOT NULL, quantity INTEGER NOT NULL CHECK(quantity>0), notes TEXT, created_at TEXT NOT NULL DEFAULT (datetime('now')), FOREIGN KEY(drug_id) REFERENCES drugs(id) ON DELETE CASCADE)""")
+    # One-time tuning: journal_mode persists in the DB file, the rest are
+    # cheap per-connection settings applied here for the schema work (pooled
+    # connections get them via get_conn). WAL + NORMAL sync removes the
+    # per-commit fsync and lets readers run alongside a writer.
+    conn.execute('PRAGMA journal_mode=WAL;')
+    conn.execute('PRAGMA synchronous=NORMAL;')
+    conn.execute('PRAGMA temp_store=MEMORY;')
+    conn.execute('PRAGMA cache_size=-65536;')
+    conn.execute('PRAGMA mmap_size=268435456;')
+    conn.execute('PRAGMA wal_autocheckpoint=1000;')
+    # Short-circuit when the newest schema object already exists on disk so
+    # each worker boot skips re-parsing the DDL under the schema lock.
+    if DB_PATH.exists() and conn.execute("SELECT 1 FROM sqlite_master WHERE name='idx_drugs_low_stock'").fetchone():
+        conn.close()
+        SCHEMA_CREATED = True
+        return
+    # One parse, one transaction for the whole DDL batch.
+    conn.executescript("""
+CREATE TABLE IF NOT EXISTS patients(id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, age INTEGER, contact TEXT);
+CREATE TABLE IF NOT EXISTS drugs(id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, dosage TEXT NOT NULL, frequency TEXT NOT NULL, stock INTEGER NOT NULL DEFAULT 0, reorder_level INTEGER NOT NULL DEFAULT 0);
+CREATE TABLE IF NOT EXISTS delivery_logs(id INTEGER PRIMARY KEY AUTOINCREMENT, patient_id INTEGER NOT NULL, drug_id INTEGER NOT NULL, delivery_date TEXT NOT NULL, status TEXT NOT NULL CHECK(status IN ('pending','delivered','missed','cancelled')), FOREIGN KEY(patient_id) REFERENCES patients(id) ON DELETE CASCADE, FOREIGN KEY(drug_id) REFERENCES drugs(id) ON DELETE CASCADE);
+CREATE TABLE IF NOT EXISTS inventory_transactions(id INTEGER PRIMARY KEY AUTOINCREMENT, drug_id INTEGER NOT NULL, delta INTEGER NOT NULL, reason TEXT, created_at TEXT NOT NULL DEFAULT (datetime('now')), FOREIGN KEY(drug_id) REFERENCES drugs(id) ON DELETE CASCADE);
+CREATE TABLE IF NOT EXISTS drug_batches(id INTEGER PRIMARY KEY AUTOINCREMENT, drug_id INTEGER NOT NULL, batch_no TEXT, isbn TEXT, producer TEXT, transporter TEXT, mfg_date TEXT, exp_date TEXT, quantity INTEGER NOT NULL CHECK(quantity>0), notes TEXT, created_at TEXT NOT NULL DEFAULT (datetime('now')), FOREIGN KEY(drug_id) REFERENCES drugs(id) ON DELETE CASCADE);
+CREATE TABLE IF NOT EXISTS drug_removals(id INTEGER PRIMARY KEY AUTOINCREMENT, drug_id INTEGER NOT NULL, batch_no TEXT, reason TEXT NOT NULL, quantity INTEGER NOT NULL CHECK(quantity>0), notes TEXT, created_at TEXT NOT NULL DEFAULT (datetime('now')), FOREIGN KEY(drug_id) REFERENCES drugs(id) ON DELETE CASCADE);
+-- Composite index matching the stats filters (status + date range scans)
+CREATE INDEX IF NOT EXISTS idx_delivery_status_date ON delivery_logs(status, delivery_date);
+CREATE INDEX IF NOT EXISTS idx_dl_date ON delivery_logs(delivery_date);
+-- (drug_id, id DESC) composites serve the filtered ORDER BY id DESC listings
+CREATE INDEX IF NOT EXISTS idx_batches_drug ON drug_batches(drug_id, id DESC);
+CREATE INDEX IF NOT EXISTS idx_removals_drug ON drug_removals(drug_id, id DESC);
+CREATE INDEX IF NOT EXISTS idx_invtx_drug ON inventory_transactions(drug_id);
+CREATE INDEX IF NOT EXISTS idx_dl_patient ON delivery_logs(patient_id);
+-- Partial index covering exactly the low-stock filter + ORDER BY name
+CREATE INDEX IF NOT EXISTS idx_drugs_low_stock ON drugs(name) WHERE COALESCE(stock,0) <= COALESCE(reorder_level,0);
+-- Stock bookkeeping runs inside SQLite: one INSERT per batch/removal replaces
+-- the three-statement Python orchestration in the endpoints.
+CREATE TRIGGER IF NOT EXISTS trg_batch_stock AFTER INSERT ON drug_batches
+BEGIN
+  UPDATE drugs SET stock = COALESCE(stock,0)+NEW.quantity WHERE id=NEW.drug_id;
+  INSERT INTO inventory_transactions(drug_id,delta,reason) VALUES(NEW.drug_id, NEW.quantity, 'batch:'||COALESCE(NEW.batch_no,''));
+END;
+CREATE TRIGGER IF NOT EXISTS trg_removal_stock AFTER INSERT ON drug_removals
+BEGIN
+  UPDATE drugs SET stock = MAX(0, COALESCE(stock,0)-NEW.quantity) WHERE id=NEW.drug_id;
+  INSERT INTO inventory_transactions(drug_id,delta,reason) VALUES(NEW.drug_id, -NEW.quantity, 'remove:'||NEW.reason);
+END;
+ANALYZE;
+""")
     conn.close()
     SCHEMA_CREATED = True
 
 init_db()
 
+# Single round-trip for /api/stats: patient/drug/delivery counts via scalar
+# subqueries, the four status counters via conditional aggregation over one
+# scan of delivery_logs (previously seven execute/fetchone calls).
+SQL_STATS = """
+SELECT (SELECT COUNT(*) FROM patients),
+       (SELECT COUNT(*) FROM drugs),
+       COUNT(*),
+       COALESCE(SUM(status='pending'), 0),
+       COALESCE(SUM(status='delivered' AND delivery_date=?), 0),
+       COALESCE(SUM(status='missed'), 0),
+       COALESCE(SUM(status='pending' AND delivery_date>=?), 0)
+FROM delivery_logs
+"""
+
+# Hot-path SQL hoisted to module constants: identical statement text on every
+# request keys straight into the pooled connections' statement caches.
+SQL_LIST_PATIENTS = 'SELECT id,name,age,contact FROM patients ORDER BY id'
+SQL_LIST_DRUGS = 'SELECT id,name,dosage,frequency,stock,reorder_level FROM drugs ORDER BY id'
+SQL_LIST_DELIVERIES = "SELECT id, patient_id, drug_id, delivery_date AS scheduled_for, status, 1 AS quantity, NULL AS notes FROM delivery_logs ORDER BY id DESC"
+SQL_INVENTORY_SUMMARY = "SELECT id,name,dosage,frequency,stock,reorder_level,0 AS pending_quantity,NULL AS daily_avg,NULL AS days_supply FROM drugs ORDER BY name"
+SQL_LIST_TXNS = 'SELECT id,drug_id,delta,reason,created_at FROM inventory_transactions{where} ORDER BY id DESC LIMIT ?'
+SQL_LIST_BATCHES = 'SELECT id,drug_id,batch_no,isbn,producer,transporter,mfg_date,exp_date,quantity,notes,created_at FROM drug_batches{where} ORDER BY id DESC LIMIT ?'
+SQL_LIST_REMOVALS = 'SELECT id,drug_id,batch_no,reason,quantity,notes,created_at FROM drug_removals{where} ORDER BY id DESC LIMIT ?'
+SQL_LOW_STOCK = "SELECT id,name,stock,reorder_level FROM drugs WHERE COALESCE(stock,0) <= COALESCE(reorder_level,0) ORDER BY name LIMIT ?"
+# COALESCE keeps a single UPDATE text for every field combination instead of
+# 31 dynamically assembled variants.
+SQL_UPDATE_DRUG = ('UPDATE drugs SET name=COALESCE(?,name), dosage=COALESCE(?,dosage), '
+                   'frequency=COALESCE(?,frequency), stock=COALESCE(?,stock), '
+                   'reorder_level=COALESCE(?,reorder_level) WHERE id=?')
+
+def _keyset_where(allow_drug=True):
+    """Build WHERE/params for keyset pagination (?drug_id= & ?before_id=)."""
+    clauses=[]; params=[]
+    if allow_drug:
+        drug_id=request.args.get('drug_id')
+        if drug_id: clauses.append('drug_id=?'); params.append(drug_id)
+    before=request.args.get('before_id')
+    if before: clauses.append('id<?'); params.append(int(before))
+    return ((' WHERE '+' AND '.join(clauses)) if clauses else ''), params
+
 # --- Utility ----------------------------------------------------------------
 
 def row_list(cur):
-    return [dict(r) for r in cur.fetchall()]
+    cols = [d[0] for d in cur.description]
+    return [dict(zip(cols, r)) for r in cur.fetchall()]
+
+def ojsonify(obj, status=200):
+    # orjson encodes to bytes in C, several times faster than jsonify's
+    # stdlib encoder on the row-list payloads the listing endpoints return.
+    return app.response_class(orjson.dumps(obj), status=status, mimetype='application/json')
+
+def _json_body():
+    return orjson.loads(request.get_data() or b'{}')
+
+@app.errorhandler(orjson.JSONDecodeError)
+def _bad_json(e):
+    return jsonify({'detail': 'invalid JSON'}), 400
+
+# Short-TTL response cache for the read-only endpoints dashboards poll every
+# few seconds. Keyed by path+query string, stores the encoded response bytes;
+# every write endpoint clears it, so a stale window only exists between polls.
+_CACHE: dict = {}
+_CACHE_TTL = 3.0
+
+def ttl_cached(fn):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        key = (request.path, request.query_string)
+        hit = _CACHE.get(key)
+        now = time.monotonic()
+        if hit is not None and now - hit[0] < _CACHE_TTL:
+            return app.response_class(hit[1], mimetype='application/json')
+        resp = fn(*args, **kwargs)
+        _CACHE[key] = (now, resp.get_data())
+        return resp
+    return wrapper
+
+def _invalidate_cache():
+    _CACHE.clear()
 
 # --- Patients ---------------------------------------------------------------
 @app.get('/api/patients')
+@ttl_cached
 def list_patients():
-    conn=get_conn(); cur=conn.execute('SELECT id,name,age,contact FROM patients ORDER BY id'); data=row_list(cur); conn.close(); return jsonify(data)
+    with conn_ctx() as conn: data=row_list(conn.execute(SQL_LIST_PATIENTS))
+    return ojsonify(data)
 
 @app.post('/api/patients')
 def create_patient():
-    payload=request.get_json(force=True)
+    payload=_json_body()
     name=payload.get('name','').strip(); age=payload.get('age'); contact=payload.get('contact')
     if not name: return jsonify({'detail':'name required'}),400
-    conn=get_conn();
-    with conn:
-        cur=conn.execute('INSERT INTO patients(name,age,contact) VALUES(?,?,?)',(name,age,contact))
-        new_id=cur.lastrowid
-    conn.close(); return jsonify({'id':new_id}),201
+    with conn_ctx() as conn:
+        with conn:
+            new_id=conn.execute('INSERT INTO patients(name,age,contact) VALUES(?,?,?) RETURNING id',(name,age,contact)).fetchone()[0]
+    _invalidate_cache()
+    return jsonify({'id':new_id}),201
+
+@app.post('/api/patients/bulk')
+def bulk_patients():
+    rows=_json_body() or []
+    clean=[]
+    for r in rows:
+        name=(r.get('name') or '').strip()
+        if not name: return jsonify({'detail':'name required'}),400
+        clean.append((name,r.get('age'),r.get('contact')))
+    with conn_ctx() as conn:
+        with conn:
+            conn.executemany('INSERT INTO patients(name,age,contact) VALUES(?,?,?)',clean)
+    _invalidate_cache()
+    return jsonify({'inserted':len(clean)}),201
 
 # --- Drugs ------------------------------------------------------------------
 @app.get('/api/drugs')
+@ttl_cached
 def list_drugs():
-    conn=get_conn(); cur=conn.execute('SELECT id,name,dosage,frequency,stock,reorder_level FROM drugs ORDER BY id'); data=row_list(cur); conn.close(); return jsonify(data)
+    with conn_ctx() as conn: data=row_list(conn.execute(SQL_LIST_DRUGS))
+    return ojsonify(data)
 
 @app.post('/api/drugs')
 def create_drug():
-    p=request.get_json(force=True); name=p.get('name','').strip(); dosage=p.get('dosage','').strip(); freq=p.get('frequency','').strip()
+    p=_json_body(); name=p.get('name','').strip(); dosage=p.get('dosage','').strip(); freq=p.get('frequency','').strip()
     if not (name and dosage and freq): return jsonify({'detail':'fields required'}),400
     stock=p.get('stock',0) or 0; reorder=p.get('reorder_level',0) or 0
-    conn=get_conn();
-    with conn:
-        cur=conn.execute('INSERT INTO drugs(name,dosage,frequency,stock,reorder_level) VALUES(?,?,?,?,?)',(name,dosage,freq,stock,reorder))
-        new_id=cur.lastrowid
-    conn.close(); return jsonify({'id':new_id}),201
+    with conn_ctx() as conn:
+        with conn:
+            new_id=conn.execute('INSERT INTO drugs(name,dosage,frequency,stock,reorder_level) VALUES(?,?,?,?,?) RETURNING id',(name,dosage,freq,stock,reorder)).fetchone()[0]
+    _invalidate_cache()
+    return jsonify({'id':new_id}),201
 
 @app.patch('/api/drugs/<int:drug_id>')
 def update_drug(drug_id):
-    p=request.get_json(force=True)
-    allowed=['name','dosage','frequency','stock','reorder_level']
-    sets=[]; vals=[]
-    for k in allowed:
-        if k in p and p[k] is not None:
-            sets.append(f"{k}=?"); vals.append(p[k])
-    if not sets: return jsonify({'updated':0})
+    p=_json_body()
+    vals=[p.get(k) for k in ('name','dosage','frequency','stock','reorder_level')]
+    if all(v is None for v in vals): return jsonify({'updated':0})
     vals.append(drug_id)
-    conn=get_conn();
-    with conn:
-        cur=conn.execute(f"UPDATE drugs SET {', '.join(sets)} WHERE id=?", vals)
-        updated=cur.rowcount
-    conn.close(); return jsonify({'updated':updated})
+    with conn_ctx() as conn:
+        with conn:
+            cur=conn.execute(SQL_UPDATE_DRUG, vals)
+            updated=cur.rowcount
+    _invalidate_cache()
+    return jsonify({'updated':updated})
 
 @app.delete('/api/drugs/<int:drug_id>')
 def delete_drug(drug_id):
-    conn=get_conn();
-    with conn:
-        cur=conn.execute('DELETE FROM drugs WHERE id=?',(drug_id,))
-        deleted=cur.rowcount
-    conn.close();
+    with conn_ctx() as conn:
+        with conn:
+            cur=conn.execute('DELETE FROM drugs WHERE id=?',(drug_id,))
+            deleted=cur.rowcount
+    _invalidate_cache()
     if not deleted: return jsonify({'detail':'Not found'}),404
     return jsonify({'deleted':True})
 
 # --- Deliveries -------------------------------------------------------------
+# Delivery payloads decode+validate in one C pass (types and required fields)
+# instead of json.loads followed by a chain of .get() checks.
+class DeliveryIn(msgspec.Struct):
+    patient_id: int
+    drug_id: int
+    delivery_date: str
+    status: str = 'pending'
+
+_DELIVERY_DEC = msgspec.json.Decoder(DeliveryIn)
+_DELIVERY_LIST_DEC = msgspec.json.Decoder(list[DeliveryIn])
+
 @app.get('/api/deliveries')
 def list_deliveries():
-    conn=get_conn(); cur=conn.execute("SELECT id, patient_id, drug_id, delivery_date AS scheduled_for, status, 1 AS quantity, NULL AS notes FROM delivery_logs ORDER BY id DESC"); data=row_list(cur); conn.close(); return jsonify(data)
+    with conn_ctx() as conn: data=row_list(conn.execute(SQL_LIST_DELIVERIES))
+    return ojsonify(data)
 
 @app.post('/api/deliveries')
 def create_delivery():
-    p=request.get_json(force=True)
-    patient_id=p.get('patient_id'); drug_id=p.get('drug_id'); delivery_date=p.get('delivery_date'); status=p.get('status','pending')
-    if status not in ALLOWED_STATUSES: return jsonify({'detail':'bad status'}),400
-    try: date.fromisoformat(delivery_date)
-    except Exception: return jsonify({'detail':'bad date'}),400
-    conn=get_conn();
-    with conn:
-        cur=conn.execute('INSERT INTO delivery_logs(patient_id,drug_id,delivery_date,status) VALUES(?,?,?,?)',(patient_id,drug_id,delivery_date,status))
-        new_id=cur.lastrowid
-    conn.close(); return jsonify({'id':new_id}),201
+    try: d=_DELIVERY_DEC.decode(request.get_data())
+    except msgspec.DecodeError as e: return jsonify({'detail':str(e)}),400
+    if d.status not in ALLOWED_STATUSES: return jsonify({'detail':'bad status'}),400
+    if not _DATE_RE(d.delivery_date): return jsonify({'detail':'bad date'}),400
+    with conn_ctx() as conn:
+        with conn:
+            new_id=conn.execute('INSERT INTO delivery_logs(patient_id,drug_id,delivery_date,status) VALUES(?,?,?,?) RETURNING id',(d.patient_id,d.drug_id,d.delivery_date,d.status)).fetchone()[0]
+    _invalidate_cache()
+    return jsonify({'id':new_id}),201
 
 @app.patch('/api/deliveries/<int:delivery_id>/status')
 def update_delivery_status(delivery_id):
-    p=request.get_json(force=True); status=p.get('status')
+    p=_json_body(); status=p.get('status')
     if status not in ALLOWED_STATUSES: return jsonify({'detail':'bad status'}),400
-    conn=get_conn();
-    with conn:
-        cur=conn.execute('UPDATE delivery_logs SET status=? WHERE id=?',(status,delivery_id))
-        if cur.rowcount==0:
-            conn.close(); return jsonify({'detail':'Not found'}),404
-    conn.close(); return jsonify({'ok':True})
+    with conn_ctx() as conn:
+        with conn:
+            cur=conn.execute('UPDATE delivery_logs SET status=? WHERE id=?',(status,delivery_id))
+            if cur.rowcount==0:
+                return jsonify({'detail':'Not found'}),404
+    _invalidate_cache()
+    return jsonify({'ok':True})
 
 @app.delete('/api/deliveries/<int:delivery_id>')
 def delete_delivery(delivery_id):
-    conn=get_conn();
-    with conn:
-        cur=conn.execute('DELETE FROM delivery_logs WHERE id=?',(delivery_id,))
-        deleted=cur.rowcount
-    conn.close();
+    with conn_ctx() as conn:
+        with conn:
+            cur=conn.execute('DELETE FROM delivery_logs WHERE id=?',(delivery_id,))
+            deleted=cur.rowcount
+    _invalidate_cache()
     if not deleted: return jsonify({'detail':'Not found'}),404
     return jsonify({'deleted':True})
 
+@app.post('/api/deliveries/bulk')
+def bulk_deliveries():
+    try: rows=_DELIVERY_LIST_DEC.decode(request.get_data())
+    except msgspec.DecodeError as e: return jsonify({'detail':str(e)}),400
+    clean=[]
+    for d in rows:
+        if d.status not in ALLOWED_STATUSES: return jsonify({'detail':'bad status'}),400
+        if not _DATE_RE(d.delivery_date): return jsonify({'detail':'bad date'}),400
+        clean.append((d.patient_id,d.drug_id,d.delivery_date,d.status))
+    with conn_ctx() as conn:
+        with conn:
+            conn.executemany('INSERT INTO delivery_logs(patient_id,drug_id,delivery_date,status) VALUES(?,?,?,?)',clean)
+    _invalidate_cache()
+    return jsonify({'inserted':len(clean)}),201
+
 # --- Inventory --------------------------------------------------------------
 @app.get('/api/inventory/summary')
+@ttl_cached
 def inventory_summary():
-    conn=get_conn();
-    cur=conn.execute("SELECT id,name,dosage,frequency,stock,reorder_level,0 AS pending_quantity,NULL AS daily_avg,NULL AS days_supply FROM drugs ORDER BY name")
-    data=row_list(cur); conn.close(); return jsonify(data)
+    with conn_ctx() as conn:
+        data=row_list(conn.execute(SQL_INVENTORY_SUMMARY))
+    return ojsonify(data)
 
 @app.get('/api/inventory/transactions')
 def inventory_transactions():
-    limit=int(request.args.get('limit',300))
-    conn=get_conn(); cur=conn.execute('SELECT id,drug_id,delta,reason,created_at FROM inventory_transactions ORDER BY id DESC LIMIT ?',(limit,)); data=row_list(cur); conn.close(); return jsonify(data)
+    where,params=_keyset_where()
+    params.append(int(request.args.get('limit',300)))
+    with conn_ctx() as conn: data=row_list(conn.execute(SQL_LIST_TXNS.format(where=where),params))
+    return ojsonify(data)
 
 @app.post('/api/inventory/adjust')
 def inventory_adjust():
-    p=request.get_json(force=True); drug_id=p.get('drug_id'); delta=int(p.get('delta',0)); reason=p.get('reason','manual')
+    p=_json_body(); drug_id=p.get('drug_id'); delta=int(p.get('delta',0)); reason=p.get('reason','manual')
     if not delta: return jsonify({'detail':'delta required'}),400
-    conn=get_conn();
-    with conn:
-        cur=conn.execute('SELECT stock FROM drugs WHERE id=?',(drug_id,)); row=cur.fetchone()
-        if not row: conn.close(); return jsonify({'detail':'drug not found'}),404
-        new_stock=max(0,(row[0] or 0)+delta)
-        conn.execute('UPDATE drugs SET stock=? WHERE id=?',(new_stock,drug_id))
-        conn.execute('INSERT INTO inventory_transactions(drug_id,delta,reason) VALUES(?,?,?)',(drug_id,delta,reason))
-    conn.close(); return jsonify({'ok':True})
+    with conn_ctx() as conn:
+        with conn:
+            # Clamp and update in one statement; RETURNING doubles as the
+            # existence check, replacing the SELECT + UPDATE round-trips.
+            cur=conn.execute('UPDATE drugs SET stock=MAX(0,COALESCE(stock,0)+?) WHERE id=? RETURNING stock',(delta,drug_id))
+            if cur.fetchone() is None: return jsonify({'detail':'drug not found'}),404
+            conn.execute('INSERT INTO inventory_transactions(drug_id,delta,reason) VALUES(?,?,?)',(drug_id,delta,reason))
+    _invalidate_cache()
+    return jsonify({'ok':True})
+
+@app.post('/api/inventory/adjust/bulk')
+def bulk_adjust():
+    rows=_json_body() or []
+    adj_rows=[]; txn_rows=[]
+    for r in rows:
+        delta=int(r.get('delta',0))
+        if not delta: return jsonify({'detail':'delta required'}),400
+        drug_id=r.get('drug_id')
+        adj_rows.append((delta,drug_id))
+        txn_rows.append((drug_id,delta,r.get('reason','manual')))
+    try:
+        with conn_ctx() as conn:
+            with conn:
+                conn.executemany('UPDATE drugs SET stock=MAX(0,COALESCE(stock,0)+?) WHERE id=?',adj_rows)
+                # A bad drug_id fails the transactions FK and rolls back the
+                # whole batch, matching the single-item endpoint's 404.
+                conn.executemany('INSERT INTO inventory_transactions(drug_id,delta,reason) VALUES(?,?,?)',txn_rows)
+    except sqlite3.IntegrityError:
+        return jsonify({'detail':'drug not found'}),404
+    _invalidate_cache()
+    return jsonify({'adjusted':len(adj_rows)}),201
 
 @app.post('/api/drug_batches')
 def create_batch():
-    p=request.get_json(force=True)
+    p=_json_body()
     drug_id=p.get('drug_id'); qty=int(p.get('quantity',0));
     if qty<=0: return jsonify({'detail':'quantity must be positive'}),400
-    conn=get_conn();
-    with conn:
-        conn.execute('INSERT INTO drug_batches(drug_id,batch_no,isbn,producer,transporter,mfg_date,exp_date,quantity,notes) VALUES(?,?,?,?,?,?,?,?,?)',(
-            drug_id,p.get('batch_no'),p.get('isbn'),p.get('producer'),p.get('transporter'),p.get('mfg_date'),p.get('exp_date'),qty,p.get('notes')
-        ))
-        conn.execute('UPDATE drugs SET stock=COALESCE(stock,0)+? WHERE id=?',(qty,drug_id))
-        conn.execute('INSERT INTO inventory_transactions(drug_id,delta,reason) VALUES(?,?,?)',(drug_id,qty,f"batch:{p.get('batch_no') or ''}"))
-    conn.close(); return jsonify({'ok':True}),201
+    with conn_ctx() as conn:
+        with conn:
+            # trg_batch_stock applies the stock update and transaction log
+            conn.execute('INSERT INTO drug_batches(drug_id,batch_no,isbn,producer,transporter,mfg_date,exp_date,quantity,notes) VALUES(?,?,?,?,?,?,?,?,?)',(
+                drug_id,p.get('batch_no'),p.get('isbn'),p.get('producer'),p.get('transporter'),p.get('mfg_date'),p.get('exp_date'),qty,p.get('notes')
+            ))
+    _invalidate_cache()
+    return jsonify({'ok':True}),201
+
+@app.post('/api/drug_batches/bulk')
+def bulk_batches():
+    rows=_json_body() or []
+    batch_rows=[]
+    for r in rows:
+        qty=int(r.get('quantity',0))
+        if qty<=0: return jsonify({'detail':'quantity must be positive'}),400
+        batch_rows.append((r.get('drug_id'),r.get('batch_no'),r.get('isbn'),r.get('producer'),r.get('transporter'),r.get('mfg_date'),r.get('exp_date'),qty,r.get('notes')))
+    with conn_ctx() as conn:
+        with conn:
+            # trg_batch_stock handles stock and transaction-log rows per insert
+            conn.executemany('INSERT INTO drug_batches(drug_id,batch_no,isbn,producer,transporter,mfg_date,exp_date,quantity,notes) VALUES(?,?,?,?,?,?,?,?,?)',batch_rows)
+    _invalidate_cache()
+    return jsonify({'inserted':len(batch_rows)}),201
 
 @app.get('/api/drug_batches')
+@ttl_cached
 def list_batches():
-    drug_id=request.args.get('drug_id'); params=[]; where=''
-    if drug_id:
-        where=' WHERE drug_id=?'; params.append(drug_id)
-    limit=int(request.args.get('limit',200))
-    params.append(limit)
-    conn=get_conn(); cur=conn.execute('SELECT id,drug_id,batch_no,isbn,producer,transporter,mfg_date,exp_date,quantity,notes,created_at FROM drug_batches'+where+' ORDER BY id DESC LIMIT ?',params); data=row_list(cur); conn.close(); return jsonify(data)
+    where,params=_keyset_where()
+    params.append(int(request.args.get('limit',200)))
+    with conn_ctx() as conn: data=row_list(conn.execute(SQL_LIST_BATCHES.format(where=where),params))
+    return ojsonify(data)
 
 @app.post('/api/drug_removals')
 def create_removal():
-    p=request.get_json(force=True); drug_id=p.get('drug_id'); qty=int(p.get('quantity',0)); reason=p.get('reason','').strip()
+    p=_json_body(); drug_id=p.get('drug_id'); qty=int(p.get('quantity',0)); reason=p.get('reason','').strip()
     if qty<=0: return jsonify({'detail':'quantity must be positive'}),400
     if not reason: return jsonify({'detail':'reason required'}),400
-    conn=get_conn();
-    with conn:
-        cur=conn.execute('SELECT stock FROM drugs WHERE id=?',(drug_id,)); row=cur.fetchone()
-        if not row: conn.close(); return jsonify({'detail':'drug not found'}),404
-        new_stock=max(0,(row[0] or 0)-qty)
-        conn.execute('UPDATE drugs SET stock=? WHERE id=?',(new_stock,drug_id))
-        conn.execute('INSERT INTO drug_removals(drug_id,batch_no,reason,quantity,notes) VALUES(?,?,?,?,?)',(drug_id,p.get('batch_no'),reason,qty,p.get('notes')))
-        conn.execute('INSERT INTO inventory_transactions(drug_id,delta,reason) VALUES(?,?,?)',(drug_id,-qty,f'remove:{reason}'))
-    conn.close(); return jsonify({'ok':True}),201
+    try:
+        with conn_ctx() as conn:
+            with conn:
+                # trg_removal_stock clamps the stock and logs the transaction;
+                # the FK enforces drug existence.
+                conn.execute('INSERT INTO drug_removals(drug_id,batch_no,reason,quantity,notes) VALUES(?,?,?,?,?)',(drug_id,p.get('batch_no'),reason,qty,p.get('notes')))
+    except sqlite3.IntegrityError:
+        return jsonify({'detail':'drug not found'}),404
+    _invalidate_cache()
+    return jsonify({'ok':True}),201
 
 @app.get('/api/drug_removals')
+@ttl_cached
 def list_removals():
-    drug_id=request.args.get('drug_id'); params=[]; where=''
-    if drug_id:
-        where=' WHERE drug_id=?'; params.append(drug_id)
-    limit=int(request.args.get('limit',200)); params.append(limit)
-    conn=get_conn(); cur=conn.execute('SELECT id,drug_id,batch_no,reason,quantity,notes,created_at FROM drug_removals'+where+' ORDER BY id DESC LIMIT ?',params); data=row_list(cur); conn.close(); return jsonify(data)
+    where,params=_keyset_where()
+    params.append(int(request.args.get('limit',200)))
+    with conn_ctx() as conn: data=row_list(conn.execute(SQL_LIST_REMOVALS.format(where=where),params))
+    return ojsonify(data)
+
+@app.get('/api/_pool_health')
+def pool_health():
+    # Observability for the connection pool: idle connections currently
+    # parked and the configured ceiling. qsize() is approximate under
+    # concurrency, which is fine for a diagnostic endpoint.
+    return ojsonify({'idle': _POOL.qsize(), 'max': _POOL_SIZE})
 
 # --- Stats / Health ---------------------------------------------------------
 @app.get('/api/stats')
+@ttl_cached
 def stats():
     # Provide both the legacy keys the current frontend expects (patients, drugs, deliveries, low_stock_drugs, low_stock_list)
     # and the richer analytics style keys for future use / backwards compatibility.
-    conn=get_conn(); cur=conn.execute('SELECT COUNT(*) FROM patients'); patients=cur.fetchone()[0]
-    cur=conn.execute('SELECT COUNT(*) FROM drugs'); drugs=cur.fetchone()[0]
-    cur=conn.execute('SELECT COUNT(*) FROM delivery_logs'); deliveries=cur.fetchone()[0]
     today=date.today().isoformat()
-    cur=conn.execute("SELECT COUNT(*) FROM delivery_logs WHERE status='pending'"); pending=cur.fetchone()[0]
-    cur=conn.execute("SELECT COUNT(*) FROM delivery_logs WHERE status='delivered' AND delivery_date=?",(today,)); completed=cur.fetchone()[0]
-    cur=conn.execute("SELECT COUNT(*) FROM delivery_logs WHERE status='missed'"); missed=cur.fetchone()[0]
-    cur=conn.execute("SELECT COUNT(*) FROM delivery_logs WHERE status='pending' AND delivery_date>=?",(today,)); upcoming=cur.fetchone()[0]
-    # Low stock list
-    cur=conn.execute("SELECT id,name,stock,reorder_level FROM drugs WHERE COALESCE(stock,0) <= COALESCE(reorder_level,0)")
-    low_stock_list: list[dict[str,int|str]]=[{'id':int(r[0]),'name':str(r[1]),'stock':int(r[2] or 0),'reorder_level':int(r[3] or 0)} for r in cur.fetchall()]
-    conn.close()
-    return jsonify({
+    with conn_ctx() as conn:
+        patients,drugs,deliveries,pending,completed,missed,upcoming=conn.execute(SQL_STATS,(today,today)).fetchone()
+        low_stock_list=_low_stock_rows(conn)
+    return ojsonify({
         # Legacy/simple dashboard keys
         'patients': patients,
         'drugs': drugs,
@@ -247,9 +511,17 @@ def stats():
         'upcomingDeliveries': upcoming
     })
 
+# Load balancers scrape /api/health many times a second; the body only
+# changes once a second, so serve cached pre-encoded bytes.
+_HEALTH_CACHE = {'t': 0.0, 'body': b''}
+
 @app.get('/api/health')
 def health():
-    return jsonify({'status':'ok','time': datetime.now(timezone.utc).isoformat()})
+    now = time.time()
+    if now - _HEALTH_CACHE['t'] > 1.0:
+        _HEALTH_CACHE['t'] = now
+        _HEALTH_CACHE['body'] = orjson.dumps({'status': 'ok', 'time': datetime.fromtimestamp(now, timezone.utc).isoformat()})
+    return app.response_class(_HEALTH_CACHE['body'], mimetype='application/json')
 
 # --- AI placeholder --------------------------------------------------------
 @app.route('/api/ai/answer', methods=['GET','POST'])
@@ -257,8 +529,13 @@ def ai_answer():
     """Lightweight placeholder so frontend calls don't 500. Accepts GET ?q= or POST {question}."""
     try:
         q = request.args.get('q')
-        if not q and request.is_json:
-            body = request.get_json(silent=True) or {}
+        if not q and request.data:
+            # Silent parse, like the get_json(silent=True) this replaced:
+            # malformed JSON means "no question provided" (400), not a 500.
+            try:
+                body = _json_body()
+            except orjson.JSONDecodeError:
+                body = {}
             q = body.get('question') or body.get('q')
         if not q:
             return jsonify({'answer': None, 'detail': 'no question provided'}), 400
@@ -268,12 +545,27 @@ def ai_answer():
         return jsonify({'detail': 'ai error', 'error': str(e)}), 500
 
 # --- AI chat & rewrite (stub with real inventory awareness) ---------------
+def _low_stock_rows(conn, limit: int = 500):
+    """Shared low-stock query so stats() and the AI chat path can't drift."""
+    cur = conn.execute(SQL_LOW_STOCK, (limit,))
+    return [{'id': r[0], 'name': r[1], 'stock': r[2], 'reorder_level': r[3]} for r in cur.fetchall()]
+
+
 def _current_low_stock(limit: int = 50):
-    """Return low stock drugs directly from DB (real-time)."""
-    conn = get_conn()
-    cur = conn.execute("SELECT id,name,stock,reorder_level FROM drugs WHERE COALESCE(stock,0) <= COALESCE(reorder_level,0) ORDER BY name LIMIT ?", (limit,))
-    rows = [dict(r) for r in cur.fetchall()]
-    conn.close()
+    """Return low stock drugs, memoized through the shared TTL cache.
+
+    Every /api/ai/chat call with context hits this; the underlying data only
+    changes on writes, which clear _CACHE, so a short-lived cached copy is
+    always consistent.
+    """
+    key = ('low_stock', limit)
+    hit = _CACHE.get(key)
+    now = time.monotonic()
+    if hit is not None and now - hit[0] < _CACHE_TTL:
+        return hit[1]
+    with conn_ctx() as conn:
+        rows = _low_stock_rows(conn, limit)
+    _CACHE[key] = (now, rows)
     return rows
 
 @app.post('/api/ai/chat')
@@ -295,49 +587,54 @@ def ai_chat():
       - Basic stats derived from history length
     """
     try:
-        if not request.is_json:
+        payload = _json_body()
+        if not isinstance(payload, dict):
             return jsonify({'detail': 'JSON body required'}), 400
-        payload = request.get_json(force=True) or {}
         history = payload.get('history') or []
         if not isinstance(history, list):
             return jsonify({'detail': 'history must be a list'}), 400
-        last_user = next((m.get('content','') for m in reversed(history) if isinstance(m, dict) and m.get('role')=='user'), '')
-        lower_q = (last_user or '').lower()
+        # One pass over history: last user message and prompt size together,
+        # instead of a reversed() scan plus a second sum() walk.
+        last_user = ''
+        prompt_chars = 0
+        for m in history:
+            if not isinstance(m, dict):
+                continue
+            c = str(m.get('content', ''))
+            prompt_chars += len(c)
+            if m.get('role') == 'user':
+                last_user = c
+        lower_q = last_user.lower()
         persona = (payload.get('persona') or 'general').lower()
         context_text = payload.get('context') or ''
         # Intent flags
-        wants_stock = any(k in lower_q for k in ['stockout','low stock','low-stock','reorder','stock risk','risk of stockout'])
+        wants_stock = any(k in lower_q for k in _STOCK_KEYWORDS)
         # Only fetch when context explicitly provided
         low_stock_rows = _current_low_stock() if context_text else []
-        try:
-            print(f"[AI][Flask][chat] persona={persona} ctx={'on' if context_text else 'off'} low_rows={len(low_stock_rows)}")
-        except Exception:
-            pass
+        app.logger.debug('[AI][Flask][chat] persona=%s ctx=%s low_rows=%d',
+                         persona, 'on' if context_text else 'off', len(low_stock_rows))
         parts=[]
         if last_user:
             parts.append(f"You asked: {last_user.strip()}")
         else:
-            parts.append("No direct question detected; providing status summary.")
+            parts.append(_NO_QUESTION)
         if low_stock_rows:
-            formatted = ', '.join(f"{r['name']} (stock {r['stock']} / reorder {r['reorder_level']})" for r in low_stock_rows)
+            formatted = ', '.join([f"{r['name']} (stock {r['stock']} / reorder {r['reorder_level']})" for r in low_stock_rows])
             parts.append(f"Context Low Stock Snapshot: {formatted}")
         else:
-            if wants_stock:
-                parts.append("Enable Context to retrieve the live low stock list.")
-            else:
-                parts.append("(Tip: enable Context checkbox to include live inventory risk data.)")
+            parts.append(_ENABLE_CTX if wants_stock else _TIP)
         if persona == 'friendly':
-            parts.append("Let me know if you want deeper analysis or projections – happy to help! 😊")
+            parts.append(_FRIENDLY)
         elif persona == 'analyst':
-            parts.append("Data source: live inventory snapshot at query time.")
+            parts.append(_ANALYST)
         if context_text and not low_stock_rows:
             parts.append("Context processed (no low stock anomalies).")
         if context_text and low_stock_rows:
             parts.append(f"Context integrated (lines={len(context_text.splitlines())}).")
         reply='\n'.join(parts)
-        total_chars = sum(len(str(m.get('content',''))) for m in history if isinstance(m, dict)) + len(reply)
+        total_chars = prompt_chars + len(reply)
         usage={
-            'prompt_chars': total_chars - len(reply),
+            'prompt_chars': prompt_chars,
             'completion_chars': len(reply),
             'total': total_chars,
             'total_tokens': max(1, total_chars // 4)
@@ -354,9 +651,9 @@ def ai_rewrite():
     Returns: { rewrite: str }
     """
     try:
-        if not request.is_json:
+        p = _json_body()
+        if not isinstance(p, dict):
             return jsonify({'detail': 'JSON body required'}), 400
-        p = request.get_json(force=True) or {}
         text = (p.get('text') or '').strip()
         mode_in = (p.get('mode') or 'simplify').lower().strip()
         alias_map = {
@@ -374,44 +671,57 @@ def ai_rewrite():
             return jsonify({'detail': 'text required'}), 400
         out = text
         if mode == 'simplify':
-            sentences = [s.strip() for s in text.replace('\n', ' ').split('.') if s.strip()]
+            sentences = [s for s in (x.strip() for x in _SENT_SPLIT.split(text)) if s]
             out = '. '.join(sentences[:3])
             if len(sentences) > 3:
                 out += ' (summary truncated)'
         elif mode == 'bulletize' or mode == 'bullet':
-            parts = [p.strip() for p in text.replace('\n', ' ').split('.') if p.strip()]
+            parts = [p for p in (x.strip() for x in _SENT_SPLIT.split(text)) if p]
             out = '\n'.join(f"- {p}" for p in parts)
         elif mode == 'expand':
             out = f"In more detail, {text} This elaboration is a placeholder for richer model-based expansion."  # noqa: E501
         elif mode == 'formal':
-            out = text.replace(" can't", " cannot").replace(" won't", " will not").replace(" I'm", " I am")
-            out = "In summary, " + out
+            out = "In summary, " + _CONTRACTIONS.sub(lambda m: _CMAP[m.group(0)], text)
         else:
             out = text  # unknown mode -> pass-through
-    return jsonify({'rewrite': out, 'mode': mode, 'original_mode': mode_in}), 200
+        return jsonify({'rewrite': out, 'mode': mode, 'original_mode': mode_in}), 200
     except Exception as e:  # pragma: no cover
         return jsonify({'detail': 'rewrite_error', 'error': str(e)}), 500
 
 # --- Favicon ---------------------------------------------------------------
+# Checked once at import rather than a stat syscall per request.
+_FAVICON_EXISTS = (APP_ROOT / 'public' / 'favicon.ico').exists()
 @app.get('/favicon.ico')
 def favicon():
-    pub = APP_ROOT / 'public'
-    icon = pub / 'favicon.ico'
-    if icon.exists():
-        return send_from_directory(str(pub), 'favicon.ico')
+    if _FAVICON_EXISTS:
+        # Long max-age: the icon never changes at runtime, so browsers stop
+        # re-requesting it between dashboard polls.
+        return send_from_directory(str(APP_ROOT / 'public'), 'favicon.ico', max_age=86400)
     # Graceful empty 204 instead of raising 404 stack trace in debug
     return ('', 204)
 
 # --- SPA index passthrough --------------------------------------------------
+# Resolved once at import: the dist bundle doesn't appear mid-process, so
+# re-stat'ing dist/index.html on every SPA hit was a wasted syscall.
+_DIST_INDEX = APP_ROOT / 'dist' / INDEX_HTML_NAME
+_INDEX_DIR = _DIST_INDEX.parent if _DIST_INDEX.exists() else APP_ROOT
+
+
 @app.get('/')
 def root():
     """Serve built frontend if present, else fallback to original index.html at repo root."""
-    repo_root = APP_ROOT
-    dist_index = repo_root / 'dist' / INDEX_HTML_NAME
-    if dist_index.exists():
-        return send_from_directory(dist_index.parent, INDEX_HTML_NAME)
-    return send_from_directory(repo_root, INDEX_HTML_NAME)
+    return send_from_directory(_INDEX_DIR, INDEX_HTML_NAME)
 
 if __name__ == '__main__':
-    # Use port 8000 to align with frontend default API_BASE detection.
-    app.run(debug=True, port=8000)
+    # Running this file directly serves through waitress: a real threaded WSGI
+    # server whose 8 worker threads match _POOL_SIZE, so every thread finds a
+    # warm pooled connection and WAL readers actually overlap. Werkzeug's
+    # debug server (single-threaded, reloader, evaluator) stays available for
+    # development via MED_DEBUG=1. gunicorn remains the containerized option:
+    #   gunicorn -w 2 --threads 8 -b 0.0.0.0:8000 backend.flask_app:app
+    # Port 8000 aligns with the frontend's default API_BASE detection.
+    if os.environ.get('MED_DEBUG') == '1':
+        app.run(debug=True, port=8000)
+    else:
+        from waitress import serve
+        serve(app, host='0.0.0.0', port=8000, threads=_POOL_SIZE)
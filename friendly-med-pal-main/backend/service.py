@@ -5,37 +5,70 @@ Uses sqlite3 and keeps things modular, friendly, and easy to extend.
 from __future__ import annotations
 
 import sqlite3
-from typing import Dict, List, Optional, Any
+import threading
+from typing import Any, Dict, Iterator, List, Optional
 
 from .database import get_connection, init_db, DEFAULT_DB_PATH
 
 # Allowed status values for deliveries (kept in sync with the table CHECK constraint)
-ALLOWED_STATUSES = {"pending", "delivered", "missed", "cancelled"}
+ALLOWED_STATUSES = frozenset({"pending", "delivered", "missed", "cancelled"})
+_ALLOWED_SORTED = sorted(ALLOWED_STATUSES)
+
+# Hot-path SQL as module constants: the single-row and bulk methods then pass
+# the identical string every call, so sqlite3's per-connection prepared
+# statement cache (cached_statements=512 in get_connection) always hits.
+SQL_INS_DELIVERY = (
+    "INSERT INTO delivery_logs (patient_id, drug_id, delivery_date, status) VALUES (?, ?, ?, ?)"
+)
+SQL_INS_TXN = "INSERT INTO inventory_transactions (drug_id, delta, reason) VALUES (?, ?, ?)"
+
+
+def _rows_to_dicts(cur: sqlite3.Cursor) -> List[Dict[str, Any]]:
+    """Shape a cursor's rows as dicts using column names captured once.
+
+    dict(zip(cols, row)) skips the per-row column-name hashing that
+    dict(sqlite3.Row) performs, which adds up on the list endpoints.
+    """
+    cols = [d[0] for d in cur.description]
+    return [dict(zip(cols, r)) for r in cur.fetchall()]
 
 
 class DrugDeliveryService:
     """High-level service that wraps common operations.
 
-    It manages its own connection and ensures the schema exists.
+    It manages one connection per thread and ensures the schema exists.
+    sqlite3 connections are bound to their creating thread, so a single
+    shared handle would serialize (or crash) Flask worker threads; with a
+    connection per thread, WAL readers actually run in parallel.
     """
 
     def __init__(self, db_path: Optional[str] = None) -> None:
         self.db_path = db_path or DEFAULT_DB_PATH
-        self.conn = get_connection(self.db_path)
-        init_db(self.conn)
+        self._local = threading.local()
+        self._schema_ready = False
+        init_db(self.conn)  # opens the creating thread's connection
+        self._ensure_inventory_schema()
         print(f"[Service] Connected to database at '{self.db_path}'")
 
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """This thread's connection, opened lazily on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = get_connection(self.db_path)
+            self._local.conn = conn
+        return conn
+
     # --- Patient operations -------------------------------------------------
     def add_patient(self, name: str, age: int, contact: Optional[str] = None) -> int:
         """Add a new patient and return the new patient ID."""
         try:
             with self.conn:  # transaction
                 cur = self.conn.execute(
-                    "INSERT INTO patients (name, age, contact) VALUES (?, ?, ?)",
+                    "INSERT INTO patients (name, age, contact) VALUES (?, ?, ?) RETURNING id",
                     (name, age, contact),
                 )
-                new_id_raw = cur.lastrowid
-                new_id = int(new_id_raw) if new_id_raw is not None else 0
+                new_id = int(cur.fetchone()[0])
             print(f"[Patients] Added patient id={new_id} name='{name}' age={age}")
             return new_id
         except sqlite3.IntegrityError as e:
@@ -45,17 +78,38 @@ class DrugDeliveryService:
             print(f"[Patients][Error] Unexpected error adding patient: {e}")
             raise
 
+    def add_patients_bulk(self, patients: List[Dict[str, Any]]) -> int:
+        """Insert many patients in one transaction and return the count.
+
+        Each item needs a name; age and contact are optional. One executemany
+        keeps a single BEGIN/COMMIT (one fsync) for the whole load.
+        """
+        if not patients:
+            return 0
+        rows = []
+        for p in patients:
+            name = (p.get("name") or "").strip()
+            if not name:
+                raise ValueError("name required")
+            rows.append((name, p.get("age"), p.get("contact")))
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO patients (name, age, contact) VALUES (?, ?, ?)",
+                rows,
+            )
+        print(f"[Patients] Bulk added {len(rows)} patients")
+        return len(rows)
+
     # --- Drug operations ----------------------------------------------------
     def add_drug(self, name: str, dosage: str, frequency: str) -> int:
         """Add a new drug and return the new drug ID."""
         try:
             with self.conn:
                 cur = self.conn.execute(
-                    "INSERT INTO drugs (name, dosage, frequency, stock, reorder_level) VALUES (?, ?, ?, 0, 0)",
+                    "INSERT INTO drugs (name, dosage, frequency, stock, reorder_level) VALUES (?, ?, ?, 0, 0) RETURNING id",
                     (name, dosage, frequency),
                 )
-                new_id_raw = cur.lastrowid
-                new_id = int(new_id_raw) if new_id_raw is not None else 0
+                new_id = int(cur.fetchone()[0])
             print(f"[Drugs] Added drug id={new_id} name='{name}' dosage='{dosage}' freq='{frequency}'")
             return new_id
         except sqlite3.IntegrityError as e:
@@ -65,6 +119,30 @@ class DrugDeliveryService:
             print(f"[Drugs][Error] Unexpected error adding drug: {e}")
             raise
 
+    def add_drugs_bulk(self, drugs: List[Dict[str, Any]]) -> int:
+        """Insert many drugs in one transaction and return the count.
+
+        Each item needs name, dosage and frequency; stock/reorder_level start
+        at zero like add_drug.
+        """
+        if not drugs:
+            return 0
+        rows = []
+        for d in drugs:
+            name = (d.get("name") or "").strip()
+            dosage = (d.get("dosage") or "").strip()
+            frequency = (d.get("frequency") or "").strip()
+            if not (name and dosage and frequency):
+                raise ValueError("name, dosage and frequency required")
+            rows.append((name, dosage, frequency))
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO drugs (name, dosage, frequency, stock, reorder_level) VALUES (?, ?, ?, 0, 0)",
+                rows,
+            )
+        print(f"[Drugs] Bulk added {len(rows)} drugs")
+        return len(rows)
+
     # --- Delivery operations -----------------------------------------------
     def record_delivery(
         self,
@@ -80,19 +158,15 @@ class DrugDeliveryService:
         """
         if status not in ALLOWED_STATUSES:
             raise ValueError(
-                f"Invalid status '{status}'. Allowed: {sorted(ALLOWED_STATUSES)}"
+                f"Invalid status '{status}'. Allowed: {_ALLOWED_SORTED}"
             )
         try:
             with self.conn:
                 cur = self.conn.execute(
-                    """
-                    INSERT INTO delivery_logs (patient_id, drug_id, delivery_date, status)
-                    VALUES (?, ?, ?, ?)
-                    """,
+                    SQL_INS_DELIVERY + " RETURNING id",
                     (patient_id, drug_id, delivery_date, status),
                 )
-                new_id_raw = cur.lastrowid
-                new_id = int(new_id_raw) if new_id_raw is not None else 0
+                new_id = int(cur.fetchone()[0])
             print(
                 f"[Deliveries] Recorded delivery id={new_id} patient_id={patient_id} drug_id={drug_id} date={delivery_date} status={status}"
             )
@@ -107,6 +181,28 @@ class DrugDeliveryService:
             print(f"[Deliveries][Error] Unexpected error recording delivery: {e}")
             raise
 
+    def record_deliveries_bulk(self, deliveries: List[Dict[str, Any]]) -> int:
+        """Insert many delivery events in one transaction and return the count.
+
+        Each item needs patient_id, drug_id, delivery_date and an optional
+        status (defaults to 'pending'). One executemany keeps a single
+        BEGIN/COMMIT instead of a commit per delivery.
+        """
+        if not deliveries:
+            return 0
+        rows = []
+        for d in deliveries:
+            status = d.get("status", "pending")
+            if status not in ALLOWED_STATUSES:
+                raise ValueError(
+                    f"Invalid status '{status}'. Allowed: {_ALLOWED_SORTED}"
+                )
+            rows.append((d["patient_id"], d["drug_id"], d["delivery_date"], status))
+        with self.conn:
+            self.conn.executemany(SQL_INS_DELIVERY, rows)
+        print(f"[Deliveries] Bulk recorded {len(rows)} deliveries")
+        return len(rows)
+
     def fetch_delivery_history(self, patient_id: int) -> List[Dict[str, Any]]:
         """Fetch delivery history for a patient as a list of dicts (most recent first)."""
         try:
@@ -124,19 +220,47 @@ class DrugDeliveryService:
                 """,
                 (patient_id,),
             )
-            rows = cur.fetchall()
-            result = [dict(row) for row in rows]
+            result = _rows_to_dicts(cur)
             print(f"[Deliveries] Found {len(result)} deliveries for patient_id={patient_id}")
             return result
         except Exception as e:
             print(f"[Deliveries][Error] Unexpected error fetching history: {e}")
             raise
 
+    def iter_delivery_history(self, patient_id: int, chunk: int = 512) -> Iterator[Dict[str, Any]]:
+        """Yield a patient's delivery history dict-by-dict, newest first.
+
+        Generator variant of fetch_delivery_history for large histories:
+        rows come off the cursor in fetchmany(chunk) batches, so a consumer
+        (CSV export, streaming response) never holds the full list in memory.
+        """
+        cur = self.conn.execute(
+            """
+            SELECT dl.id, dl.patient_id, p.name AS patient_name,
+                   dl.drug_id, d.name AS drug_name,
+                   d.dosage, d.frequency,
+                   dl.delivery_date, dl.status
+            FROM delivery_logs dl
+            JOIN patients p ON p.id = dl.patient_id
+            JOIN drugs d    ON d.id = dl.drug_id
+            WHERE dl.patient_id = ?
+            ORDER BY dl.delivery_date DESC, dl.id DESC
+            """,
+            (patient_id,),
+        )
+        cols = [desc[0] for desc in cur.description]
+        while True:
+            rows = cur.fetchmany(chunk)
+            if not rows:
+                return
+            for r in rows:
+                yield dict(zip(cols, r))
+
     def update_delivery_status(self, delivery_id: int, status: str) -> None:
         """Update the status of a delivery log entry."""
         if status not in ALLOWED_STATUSES:
             raise ValueError(
-                f"Invalid status '{status}'. Allowed: {sorted(ALLOWED_STATUSES)}"
+                f"Invalid status '{status}'. Allowed: {_ALLOWED_SORTED}"
             )
         try:
             with self.conn:
@@ -157,10 +281,7 @@ class DrugDeliveryService:
     # --- Inventory operations --------------------------------------------
     def _log_inventory_transaction(self, drug_id: int, delta: int, reason: str) -> int:
         with self.conn:
-            cur = self.conn.execute(
-                "INSERT INTO inventory_transactions (drug_id, delta, reason) VALUES (?, ?, ?)",
-                (drug_id, delta, reason),
-            )
+            cur = self.conn.execute(SQL_INS_TXN, (drug_id, delta, reason))
             lr = cur.lastrowid
             return int(lr) if lr is not None else 0
 
@@ -180,24 +301,60 @@ class DrugDeliveryService:
             raise ValueError("quantity must be positive")
         # Defensive: ensure columns/tables exist (in case legacy DB file present)
         self._ensure_inventory_schema()
+        # The stock increment and transaction log now happen inside the
+        # trg_batch_stock trigger, so one INSERT does all three writes.
         with self.conn:
             cur = self.conn.execute(
                 """
                 INSERT INTO drug_batches (drug_id, batch_no, isbn, producer, transporter, mfg_date, exp_date, quantity, notes)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) RETURNING id
                 """,
                 (drug_id, batch_no, isbn, producer, transporter, mfg_date, exp_date, quantity, notes),
             )
-            self.conn.execute(
-                "UPDATE drugs SET stock = COALESCE(stock,0) + ? WHERE id = ?",
-                (quantity, drug_id),
-            )
-            self._log_inventory_transaction(drug_id, quantity, f"batch:{batch_no or cur.lastrowid}")
-            new_id_raw = cur.lastrowid
-            new_id = int(new_id_raw) if new_id_raw is not None else 0
+            new_id = int(cur.fetchone()[0])
             print(f"[Inventory] Added batch id={new_id} drug_id={drug_id} qty={quantity}")
             return new_id
 
+    def add_drug_batches_bulk(self, batches: List[Dict[str, Any]]) -> int:
+        """Insert many drug batches in one transaction and return the count.
+
+        Each item needs a drug_id and positive quantity; optional fields mirror
+        add_drug_batch. Using one executemany per table keeps a single
+        BEGIN/COMMIT (one fsync) instead of a commit per batch row.
+        """
+        if not batches:
+            return 0
+        for b in batches:
+            if int(b.get("quantity", 0)) <= 0:
+                raise ValueError("quantity must be positive")
+        self._ensure_inventory_schema()
+        batch_rows = [
+            (
+                b["drug_id"],
+                b.get("batch_no"),
+                b.get("isbn"),
+                b.get("producer"),
+                b.get("transporter"),
+                b.get("mfg_date"),
+                b.get("exp_date"),
+                b["quantity"],
+                b.get("notes"),
+            )
+            for b in batches
+        ]
+        with self.conn:
+            # trg_batch_stock applies the stock increment and transaction log
+            # per inserted row.
+            self.conn.executemany(
+                """
+                INSERT INTO drug_batches (drug_id, batch_no, isbn, producer, transporter, mfg_date, exp_date, quantity, notes)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                batch_rows,
+            )
+        print(f"[Inventory] Bulk added {len(batch_rows)} batches")
+        return len(batch_rows)
+
     def remove_stock(
         self,
         drug_id: int,
@@ -211,45 +368,67 @@ class DrugDeliveryService:
         if not reason:
             raise ValueError("reason required")
         self._ensure_inventory_schema()
+        # trg_removal_stock performs the clamped stock decrement and the
+        # transaction log; the removals FK turns a missing drug into an
+        # IntegrityError we map to the same ValueError as before.
+        try:
+            with self.conn:
+                cur = self.conn.execute(
+                    """
+                    INSERT INTO drug_removals (drug_id, batch_no, reason, quantity, notes)
+                    VALUES (?, ?, ?, ?, ?) RETURNING id
+                    """,
+                    (drug_id, batch_no, reason, quantity, notes),
+                )
+                rid = int(cur.fetchone()[0])
+        except sqlite3.IntegrityError:
+            raise ValueError("drug not found")
+        print(f"[Inventory] Removed qty={quantity} drug_id={drug_id} reason={reason}")
+        return rid
+
+    def remove_stock_bulk(self, removals: List[Dict[str, Any]]) -> int:
+        """Apply many stock removals in one transaction and return the count.
+
+        Each item needs drug_id, a positive quantity and a reason; optional
+        batch_no/notes mirror remove_stock. The removal trigger clamps stock
+        at zero per row just like the single-row path.
+        """
+        if not removals:
+            return 0
+        for r in removals:
+            if int(r.get("quantity", 0)) <= 0:
+                raise ValueError("quantity must be positive")
+            if not r.get("reason"):
+                raise ValueError("reason required")
+        self._ensure_inventory_schema()
+        removal_rows = [
+            (r["drug_id"], r.get("batch_no"), r["reason"], r["quantity"], r.get("notes"))
+            for r in removals
+        ]
         with self.conn:
-            cur_stock = self.conn.execute(
-                "SELECT stock FROM drugs WHERE id=?", (drug_id,)
-            ).fetchone()
-            if not cur_stock:
-                raise ValueError("drug not found")
-            new_stock = max(0, (cur_stock[0] or 0) - quantity)
-            self.conn.execute(
-                "UPDATE drugs SET stock=? WHERE id=?", (new_stock, drug_id)
-            )
-            cur = self.conn.execute(
+            # trg_removal_stock clamps the stock and logs the transaction per
+            # inserted row.
+            self.conn.executemany(
                 """
                 INSERT INTO drug_removals (drug_id, batch_no, reason, quantity, notes)
                 VALUES (?, ?, ?, ?, ?)
                 """,
-                (drug_id, batch_no, reason, quantity, notes),
+                removal_rows,
             )
-            self._log_inventory_transaction(drug_id, -quantity, f"remove:{reason}")
-            rid_raw = cur.lastrowid
-            rid = int(rid_raw) if rid_raw is not None else 0
-            print(f"[Inventory] Removed qty={quantity} drug_id={drug_id} reason={reason}")
-            return rid
+        print(f"[Inventory] Bulk removed {len(removal_rows)} entries")
+        return len(removal_rows)
 
     def adjust_inventory(self, drug_id: int, delta: int, reason: str) -> int:
         if delta == 0:
             raise ValueError("delta cannot be zero")
         self._ensure_inventory_schema()
         with self.conn:
-            cur_stock = self.conn.execute(
-                "SELECT stock FROM drugs WHERE id=?", (drug_id,)
+            row = self.conn.execute(
+                "UPDATE drugs SET stock = MAX(0, COALESCE(stock,0) + ?) WHERE id = ? RETURNING stock",
+                (delta, drug_id),
             ).fetchone()
-            if not cur_stock:
+            if row is None:
                 raise ValueError("drug not found")
-            new_stock = (cur_stock[0] or 0) + delta
-            if new_stock < 0:
-                new_stock = 0
-            self.conn.execute(
-                "UPDATE drugs SET stock=? WHERE id=?", (new_stock, drug_id)
-            )
             tid = self._log_inventory_transaction(drug_id, delta, reason)
             print(f"[Inventory] Adjust drug_id={drug_id} delta={delta} reason={reason}")
             return tid
@@ -263,7 +442,7 @@ class DrugDeliveryService:
         sql += " ORDER BY id DESC LIMIT ?"
         params.append(limit)
         cur = self.conn.execute(sql, params)
-        return [dict(r) for r in cur.fetchall()]
+        return _rows_to_dicts(cur)
 
     def list_removals(self, drug_id: Optional[int] = None, limit: int = 200) -> List[Dict[str, Any]]:
         sql = "SELECT id, drug_id, batch_no, reason, quantity, notes, created_at FROM drug_removals"
@@ -274,14 +453,14 @@ class DrugDeliveryService:
         sql += " ORDER BY id DESC LIMIT ?"
         params.append(limit)
         cur = self.conn.execute(sql, params)
-        return [dict(r) for r in cur.fetchall()]
+        return _rows_to_dicts(cur)
 
     def list_transactions(self, limit: int = 300) -> List[Dict[str, Any]]:
         cur = self.conn.execute(
             "SELECT id, drug_id, delta, reason, created_at FROM inventory_transactions ORDER BY id DESC LIMIT ?",
             (limit,),
         )
-        return [dict(r) for r in cur.fetchall()]
+        return _rows_to_dicts(cur)
 
     def inventory_summary(self) -> List[Dict[str, Any]]:
         # Basic summary: join drugs with stock info; daily_avg, pending_quantity, days_supply placeholders
@@ -296,15 +475,18 @@ class DrugDeliveryService:
             ORDER BY d.name ASC
             """
         )
-        return [dict(r) for r in cur.fetchall()]
+        return _rows_to_dicts(cur)
 
     # --- Internal schema guard -------------------------------------------
     def _ensure_inventory_schema(self) -> None:
         """Ensure legacy databases have new inventory columns/tables.
 
-        Called lazily before inventory ops to avoid 500s when an old DB file
-        exists (created before new migrations were added).
+        Runs once per service instance: the schema can't change between
+        calls, so after the first pass this is a boolean check instead of a
+        PRAGMA plus CREATEs on every inventory op.
         """
+        if self._schema_ready:
+            return
         cur = self.conn.execute("PRAGMA table_info(drugs);")
         cols = {row[1] for row in cur.fetchall()}
         with self.conn:
@@ -324,11 +506,34 @@ class DrugDeliveryService:
             self.conn.execute("CREATE TABLE IF NOT EXISTS inventory_transactions (id INTEGER PRIMARY KEY AUTOINCREMENT, drug_id INTEGER NOT NULL, delta INTEGER NOT NULL, reason TEXT, created_at TEXT NOT NULL DEFAULT (datetime('now')), FOREIGN KEY(drug_id) REFERENCES drugs(id) ON DELETE CASCADE);")
             self.conn.execute("CREATE TABLE IF NOT EXISTS drug_batches (id INTEGER PRIMARY KEY AUTOINCREMENT, drug_id INTEGER NOT NULL, batch_no TEXT, isbn TEXT, producer TEXT, transporter TEXT, mfg_date TEXT, exp_date TEXT, quantity INTEGER NOT NULL CHECK(quantity>0), notes TEXT, created_at TEXT NOT NULL DEFAULT (datetime('now')), FOREIGN KEY(drug_id) REFERENCES drugs(id) ON DELETE CASCADE);")
             self.conn.execute("CREATE TABLE IF NOT EXISTS drug_removals (id INTEGER PRIMARY KEY AUTOINCREMENT, drug_id INTEGER NOT NULL, batch_no TEXT, reason TEXT NOT NULL, quantity INTEGER NOT NULL CHECK(quantity>0), notes TEXT, created_at TEXT NOT NULL DEFAULT (datetime('now')), FOREIGN KEY(drug_id) REFERENCES drugs(id) ON DELETE CASCADE);")
+            # Same triggers (same names/DDL) the Flask app installs: batch and
+            # removal inserts adjust drugs.stock and log the transaction inside
+            # the engine, so the Python side issues one statement per write.
+            self.conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS trg_batch_stock AFTER INSERT ON drug_batches "
+                "BEGIN "
+                "UPDATE drugs SET stock = COALESCE(stock,0)+NEW.quantity WHERE id=NEW.drug_id; "
+                "INSERT INTO inventory_transactions(drug_id,delta,reason) VALUES(NEW.drug_id, NEW.quantity, 'batch:'||COALESCE(NEW.batch_no,'')); "
+                "END;"
+            )
+            self.conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS trg_removal_stock AFTER INSERT ON drug_removals "
+                "BEGIN "
+                "UPDATE drugs SET stock = MAX(0, COALESCE(stock,0)-NEW.quantity) WHERE id=NEW.drug_id; "
+                "INSERT INTO inventory_transactions(drug_id,delta,reason) VALUES(NEW.drug_id, -NEW.quantity, 'remove:'||NEW.reason); "
+                "END;"
+            )
+        self._schema_ready = True
 
     # --- Utility ------------------------------------------------------------
     def close(self) -> None:
+        """Close the calling thread's connection, if it opened one."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            return
+        self._local.conn = None
         try:
-            self.conn.close()
+            conn.close()
             print("[Service] Connection closed")
         except Exception:
             # Silently ignore close errors; not critical.
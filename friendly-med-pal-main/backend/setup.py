@@ -0,0 +1,29 @@
+"""Optional mypyc build for the backend's pure-Python data layer.
+
+Usage (from friendly-med-pal-main/):
+    pip install mypy  # mypyc ships with mypy
+    python backend/setup.py build_ext --inplace
+
+Compiles service.py and database.py ahead of time to shave interpreter
+overhead off the per-request service calls. api.py is deliberately left out:
+its FastAPI decorators, async handlers and msgspec Structs don't benefit
+from (or compile under) mypyc. The pure-Python sources remain the import
+fallback whenever the compiled extensions are absent, so this step is
+strictly optional.
+"""
+from setuptools import setup
+
+try:
+    from mypyc.build import mypycify
+except ImportError as e:  # pragma: no cover - build-time only
+    raise SystemExit("mypyc is required for this optional build: pip install mypy") from e
+
+setup(
+    name="meddelivery-backend-compiled",
+    ext_modules=mypycify(
+        [
+            "backend/service.py",
+            "backend/database.py",
+        ]
+    ),
+)